@@ -1,10 +1,94 @@
-import xml.etree.ElementTree as ET
 import sys
 import os
-import urllib.request
-import urllib.parse
-import json
-from typing import Dict, Any, List
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, BinaryIO, Optional
+
+# Параметры конфигурации в порядке вывода: (имя элемента, значение по умолчанию)
+CONFIG_FIELDS = (
+    ('package_name', None),
+    ('repository_url', None),
+    ('test_mode', 'false'),
+    ('test_repository_path', None),
+    ('output_filename', None),
+)
+CONFIG_ELEMENTS = frozenset(name for name, _ in CONFIG_FIELDS)
+
+try:
+    # lxml строит дерево на C (libxml2), API совместим с ElementTree
+    from lxml import etree as ET
+    LXML_AVAILABLE = True
+    XML_PARSE_ERRORS = (ET.XMLSyntaxError,)
+    # Пробельные узлы между элементами отбрасываются ещё в libxml2,
+    # а фильтр по тегам выполняется в C: в Python приходят только нужные элементы.
+    # Комментарии и инструкции обработки удаляются, иначе .text обрывается на них
+    ITERPARSE_OPTIONS = {
+        'remove_blank_text': True,
+        'remove_comments': True,
+        'remove_pis': True,
+        'tag': tuple(CONFIG_ELEMENTS),
+    }
+except ImportError:
+    import xml.etree.ElementTree as ET
+    LXML_AVAILABLE = False
+    XML_PARSE_ERRORS = (ET.ParseError,)
+    ITERPARSE_OPTIONS = {}
+
+# Имя пакета в начале строки требования (PEP 508), если packaging недоступен
+REQUIREMENT_NAME_RE = re.compile(r'\s*([A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)')
+
+# Разделители, сводимые к '-' при нормализации имени пакета (PEP 503)
+NAME_SEPARATORS_RE = re.compile(r'[-_.]+')
+
+# Маркер окружения, ограничивающий требование дополнительной группой (extra)
+EXTRA_MARKER_RE = re.compile(r'\bextra\b')
+
+# Допустимые схемы URL репозитория
+URL_SCHEMES = ('http://', 'https://')
+
+# Нормализация значений параметров при извлечении
+CONFIG_NORMALIZERS = {
+    'test_mode': str.lower,
+}
+
+# Проверки параметров при извлечении: имя -> ((предикат, сообщение об ошибке), ...)
+CONFIG_VALIDATORS = {
+    'package_name': (
+        (bool, "Имя пакета не может быть пустым"),
+    ),
+    'test_mode': (
+        (lambda mode: mode in ('true', 'false'), "Режим тестирования должен быть 'true' или 'false'"),
+    ),
+    'output_filename': (
+        (bool, "Имя выходного файла не может быть пустым"),
+    ),
+}
+
+# Локальный кэш метаданных PyPI и время его жизни в секундах
+PYPI_CACHE_DIR = Path(os.path.expanduser('~/.cache/dep_viz'))
+PYPI_CACHE_TTL = 86400
+
+# Суффикс файла с JSON-индексом тестового репозитория
+TEST_INDEX_SUFFIX = '.idx.json'
+
+# Число параллельных запросов к PyPI при обходе транзитивных зависимостей
+PYPI_MAX_WORKERS = 16
+
+# Кэш разобранных конфигураций: (абсолютный путь, mtime_ns, размер) -> config
+_CONFIG_CACHE: Dict[tuple, Dict[str, Any]] = {}
+
+
+@lru_cache(maxsize=None)
+def _load_packaging():
+    """Ленивый импорт packaging (нужен только для PyPI); None, если он не установлен"""
+    try:
+        import packaging.requirements
+        import packaging.utils
+    except ImportError:
+        return None
+    return packaging
 
 
 class ConfigError(Exception):
@@ -16,63 +100,100 @@ class DependencyFetchError(Exception):
 
 
 class DependencyVisualizer:
-    def __init__(self):
+    def __init__(self, refresh: bool = False):
         self.config = {}
         self.dependencies = []
+        self.refresh = refresh
+        self.fetch_errors = {}
+        self._session = None
 
     def load_config(self, config_path: str = 'config.xml') -> Dict[str, Any]:
-        if not os.path.exists(config_path):
+        try:
+            config_file = open(config_path, 'rb')
+        except FileNotFoundError:
             raise ConfigError(f"Файл '{config_path}' не найден")
-        if not os.access(config_path, os.R_OK):
+        except PermissionError:
             raise ConfigError(f"Нет прав на чтение файла '{config_path}'")
-
-        try:
-            tree = ET.parse(config_path)
-            root = tree.getroot()
-
-            self.config = {
-                'package_name': self._get_element_text(root, 'package_name'),
-                'repository_url': self._get_element_text(root, 'repository_url'),
-                'test_mode': self._get_element_text(root, 'test_mode', 'false'),
-                'test_repository_path': self._get_element_text(root, 'test_repository_path'),
-                'output_filename': self._get_element_text(root, 'output_filename')
-            }
-
-            self._validate_config()
-            return self.config
-
-        except ET.ParseError as e:
-            raise ConfigError(f"Ошибка парсинга XML: {e}")
-        except Exception as e:
+        except OSError as e:
             raise ConfigError(f"Ошибка загрузки конфигурации: {e}")
 
-    def _get_element_text(self, root, element_name: str, default: str = None) -> str:
-        element = root.find(element_name)
-        if element is None or element.text is None:
-            if default is not None:
-                return default
-            raise ConfigError(f"Параметр '{element_name}' отсутствует или пуст")
-        return element.text.strip()
-
-    def _validate_config(self) -> None:
-        if not self.config['package_name']:
-            raise ConfigError("Имя пакета не может быть пустым")
-
-        test_mode = self.config['test_mode'].lower()
-        if test_mode not in ('true', 'false'):
-            raise ConfigError("Режим тестирования должен быть 'true' или 'false'")
-        self.config['test_mode'] = test_mode
-
-        if test_mode == 'true':
-            if not self.config['test_repository_path']:
+        with config_file:
+            st = os.fstat(config_file.fileno())
+            cache_key = (os.path.abspath(config_path), st.st_mtime_ns, st.st_size)
+            if cache_key in _CONFIG_CACHE:
+                self.config = dict(_CONFIG_CACHE[cache_key])
+                return self.config
+
+            try:
+                self.config = self._build_config(self._read_config_elements(config_file))
+                _CONFIG_CACHE[cache_key] = dict(self.config)
+                return self.config
+
+            except XML_PARSE_ERRORS as e:
+                raise ConfigError(f"Ошибка парсинга XML: {e}")
+            except Exception as e:
+                raise ConfigError(f"Ошибка загрузки конфигурации: {e}")
+
+    def _read_config_elements(self, config_file: BinaryIO) -> Dict[str, str]:
+        """Потоковое чтение нужных элементов без построения полного дерева.
+
+        Учитываются только прямые потомки корня; при повторах берётся первый элемент.
+        """
+        values = {}
+        if LXML_AVAILABLE:
+            # lxml хранит ссылку на родителя: у прямого потомка корня нет деда
+            for _, elem in ET.iterparse(config_file, events=('end',), **ITERPARSE_OPTIONS):
+                parent = elem.getparent()
+                if parent is not None and parent.getparent() is None:
+                    self._store_config_element(values, elem)
+                    if len(values) == len(CONFIG_ELEMENTS):
+                        break
+        else:
+            depth = 0
+            for event, elem in ET.iterparse(config_file, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth == 1 and elem.tag in CONFIG_ELEMENTS:
+                    self._store_config_element(values, elem)
+                    if len(values) == len(CONFIG_ELEMENTS):
+                        break
+        return values
+
+    def _store_config_element(self, values: Dict[str, str], elem) -> None:
+        # str.strip() возвращает тот же объект, если пробелов по краям нет
+        text = elem.text
+        values.setdefault(elem.tag, text.strip() if text is not None else None)
+        elem.clear()
+
+    def _build_config(self, values: Dict[str, str]) -> Dict[str, Any]:
+        """Извлечение, нормализация и проверка параметров за один проход"""
+        config = {}
+        get_value = values.get
+        for name, default in CONFIG_FIELDS:
+            value = get_value(name)
+            if value is None:
+                if default is None:
+                    raise ConfigError(f"Параметр '{name}' отсутствует или пуст")
+                value = default
+            if name in CONFIG_NORMALIZERS:
+                value = CONFIG_NORMALIZERS[name](value)
+            for predicate, message in CONFIG_VALIDATORS.get(name, ()):
+                if not predicate(value):
+                    raise ConfigError(message)
+            config[name] = value
+
+        # Обязательность пути или URL зависит от режима тестирования
+        if config['test_mode'] == 'true':
+            if not config['test_repository_path']:
                 raise ConfigError("Путь к тестовому репозиторию обязателен")
         else:
-            url = self.config['repository_url']
-            if not url or not (url.startswith('http://') or url.startswith('https://')):
+            url = config['repository_url']
+            if not url or not url.startswith(URL_SCHEMES):
                 raise ConfigError("URL репозитория обязателен и должен начинаться с http:// или https://")
 
-        if not self.config['output_filename']:
-            raise ConfigError("Имя выходного файла не может быть пустым")
+        return config
 
     def fetch_dependencies(self) -> List[str]:
         """Получение прямых зависимостей пакета из PyPI JSON API"""
@@ -85,21 +206,71 @@ class DependencyVisualizer:
         else:
             return self._fetch_from_pypi(package_name)
 
+    def fetch_transitive(self, root: str) -> Dict[str, List[str]]:
+        """Получение графа транзитивных зависимостей пакета из PyPI.
+
+        Ключи и зависимости в графе нормализованы по PEP 503; требования,
+        нужные только для дополнительных групп (extra), не обходятся.
+        Ошибки загрузки зависимостей сохраняются в self.fetch_errors,
+        такие пакеты попадают в граф без зависимостей.
+        """
+        from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+        root = self._canonical_name(root)
+        graph = {}
+        visited = {root}
+        self.fetch_errors = {}
+        # Сессия создаётся до запуска потоков, чтобы все они делили один пул соединений
+        self._get_session()
+
+        # Загрузки идут в пуле потоков; граф и множество посещённых пакетов
+        # изменяются только в этом потоке, поэтому блокировка не нужна
+        with ThreadPoolExecutor(max_workers=PYPI_MAX_WORKERS) as executor:
+            pending = {executor.submit(self._fetch_one, root, False): root}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    package_name = pending.pop(future)
+                    try:
+                        dependencies = future.result()
+                    except DependencyFetchError as e:
+                        if package_name == root:
+                            raise
+                        self.fetch_errors[package_name] = str(e)
+                        dependencies = []
+
+                    graph[package_name] = list(dict.fromkeys(self._canonical_name(dep) for dep in dependencies))
+                    for dep in graph[package_name]:
+                        if dep not in visited:
+                            visited.add(dep)
+                            pending[executor.submit(self._fetch_one, dep, False)] = dep
+
+        return graph
+
     def _fetch_from_pypi(self, package_name: str) -> List[str]:
         """Получение зависимостей из PyPI JSON API"""
+        self.dependencies = self._fetch_one(package_name)
+        return self.dependencies
+
+    def _fetch_one(self, package_name: str, include_extras: bool = True) -> List[str]:
+        """Загрузка прямых зависимостей одного пакета из PyPI без изменения состояния"""
+        # Сетевые модули нужны только вне тестового режима
+        import json
+        import urllib.error
+
         try:
-            # Используем PyPI JSON API вместо Simple API
-            api_url = f"https://pypi.org/pypi/{package_name}/json"
+            cache_path = PYPI_CACHE_DIR / f"{self._canonical_name(package_name)}.json"
+            data = None if self.refresh else self._read_pypi_cache(cache_path)
 
-            # Загружаем JSON данные о пакете
-            with urllib.request.urlopen(api_url) as response:
-                data = json.loads(response.read().decode('utf-8'))
+            if data is None:
+                data = self._download_pypi_json(package_name)
+                self._write_pypi_cache(cache_path, data)
 
             # Извлекаем зависимости из информации о пакете
-            dependencies = self._extract_dependencies_from_json(data)
-            self.dependencies = dependencies
-            return dependencies
+            return self._extract_dependencies_from_json(data, include_extras)
 
+        except DependencyFetchError:
+            raise
         except urllib.error.HTTPError as e:
             if e.code == 404:
                 raise DependencyFetchError(f"Пакет '{package_name}' не найден в PyPI")
@@ -112,31 +283,123 @@ class DependencyVisualizer:
         except Exception as e:
             raise DependencyFetchError(f"Ошибка получения зависимостей: {e}")
 
-    def _extract_dependencies_from_json(self, data: Dict) -> List[str]:
-        """Извлечение зависимостей из JSON данных PyPI"""
-        dependencies = []
+    def _get_session(self):
+        """Ленивое создание requests.Session; None, если requests не установлен"""
+        if self._session is None:
+            try:
+                # requests.Session переиспользует TCP/TLS-соединения между запросами
+                import requests
+            except ImportError:
+                self._session = False
+            else:
+                self._session = requests.Session()
+                self._session.headers['Accept-Encoding'] = 'gzip'
+                # Пул на хост не меньше числа потоков fetch_transitive, иначе
+                # лишние соединения закрываются и переиспользование теряется
+                self._session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=PYPI_MAX_WORKERS))
+        return self._session or None
+
+    def _download_pypi_json(self, package_name: str) -> Dict:
+        """Загрузка JSON с PyPI через общую сессию или, без requests, через urllib"""
+        # Используем PyPI JSON API вместо Simple API
+        api_url = f"https://pypi.org/pypi/{package_name}/json"
+
+        session = self._get_session()
+        if session is not None:
+            import requests
+
+            try:
+                response = session.get(api_url, timeout=10)
+                response.raise_for_status()
+            except requests.RequestException as e:
+                if e.response is None:
+                    raise DependencyFetchError(f"Ошибка подключения: {e}")
+                elif e.response.status_code == 404:
+                    raise DependencyFetchError(f"Пакет '{package_name}' не найден в PyPI")
+                else:
+                    raise DependencyFetchError(f"HTTP ошибка: {e.response.status_code}")
+            return response.json()
+
+        import gzip
+        import json
+        import urllib.request
+
+        # Загружаем JSON данные о пакете, разрешая сжатие ответа
+        request = urllib.request.Request(api_url, headers={'Accept-Encoding': 'gzip'})
+        with urllib.request.urlopen(request, timeout=10) as response:
+            if response.headers.get('Content-Encoding') == 'gzip':
+                with gzip.GzipFile(fileobj=response) as body:
+                    return json.load(body)
+            return json.load(response)
+
+    def _read_pypi_cache(self, cache_path: Path) -> Optional[Dict]:
+        """Чтение метаданных пакета из локального кэша, если он не устарел"""
+        import json
+
+        try:
+            if time.time() - cache_path.stat().st_mtime >= PYPI_CACHE_TTL:
+                return None
+            with cache_path.open('rb') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Валидный JSON не того вида считается промахом кэша
+        return data if isinstance(data, dict) else None
+
+    def _write_pypi_cache(self, cache_path: Path, data: Dict) -> None:
+        """Атомарная запись метаданных пакета в локальный кэш"""
+        import json
 
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with tmp_path.open('w', encoding='utf-8') as f:
+                json.dump(data, f)
+            tmp_path.replace(cache_path)
+        except OSError:
+            pass
+
+    def _extract_dependencies_from_json(self, data: Dict, include_extras: bool = True) -> List[str]:
+        """Извлечение зависимостей из JSON данных PyPI"""
         # Ищем зависимости в информации о пакете
         info = data.get('info', {})
 
         # Зависимости могут быть в requires_dist
-        requires_dist = info.get('requires_dist', [])
-        if requires_dist:
-            for requirement in requires_dist:
-                # Извлекаем имя пакета из строки требования
-                # Формат: "package-name [optional] (version)"
-                package_match = requirement.split(' ')[0]
-                if package_match and not package_match.startswith('['):
-                    dependencies.append(package_match)
+        requires_dist = info.get('requires_dist') or ()
+        if not include_extras:
+            requires_dist = [r for r in requires_dist if not self._is_extra_requirement(r)]
+
+        # Словарь вместо множества: дубликаты убираются с сохранением порядка
+        dependencies = dict.fromkeys(self._requirement_name(requirement) for requirement in requires_dist)
+        dependencies.pop(None, None)
 
         # Если не нашли в requires_dist, пробуем requires
         if not dependencies:
-            requires = info.get('requires', [])
-            if requires:
-                dependencies.extend(requires)
-
-        # Убираем дубликаты и возвращаем
-        return list(set(dependencies))
+            dependencies = dict.fromkeys(info.get('requires') or ())
+
+        return list(dependencies)
+
+    def _requirement_name(self, requirement: str) -> Optional[str]:
+        """Извлечение имени пакета из строки требования PEP 508"""
+        packaging = _load_packaging()
+        if packaging is not None:
+            try:
+                return packaging.requirements.Requirement(requirement).name
+            except packaging.requirements.InvalidRequirement:
+                pass
+        match = REQUIREMENT_NAME_RE.match(requirement)
+        return match.group(1) if match else None
+
+    def _is_extra_requirement(self, requirement: str) -> bool:
+        """Проверка, что требование действует только для дополнительной группы (extra)"""
+        return bool(EXTRA_MARKER_RE.search(requirement.partition(';')[2]))
+
+    def _canonical_name(self, package_name: str) -> str:
+        """Нормализация имени пакета по PEP 503"""
+        packaging = _load_packaging()
+        if packaging is not None:
+            return packaging.utils.canonicalize_name(package_name)
+        return NAME_SEPARATORS_RE.sub('-', package_name).lower()
 
     def _fetch_from_test_file(self) -> List[str]:
         """Получение зависимостей из тестового файла"""
@@ -146,35 +409,63 @@ class DependencyVisualizer:
             raise DependencyFetchError(f"Тестовый файл '{test_file_path}' не найден")
 
         try:
-            with open(test_file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-
             package_name = self.config['package_name']
-            self.dependencies = self._parse_dependencies_from_file(content, package_name)
+            index = self._load_test_index(test_file_path)
+            if package_name.lower() not in index:
+                raise DependencyFetchError(f"Пакет '{package_name}' не найден в тестовом файле")
+            self.dependencies = list(index[package_name.lower()])
             return self.dependencies
 
         except Exception as e:
             raise DependencyFetchError(f"Ошибка чтения тестового файла: {e}")
 
-    def _parse_dependencies_from_file(self, content: str, package_name: str) -> List[str]:
-        """Парсинг зависимостей из тестового файла"""
-        lines = content.strip().split('\n')
+    def _load_test_index(self, test_file_path: str) -> Dict[str, List[str]]:
+        """Загрузка индекса тестового файла, перестроение при изменении файла"""
+        import json
 
-        for line in lines:
+        st = os.stat(test_file_path)
+        source_key = [st.st_mtime_ns, st.st_size]
+        index_path = test_file_path + TEST_INDEX_SUFFIX
+
+        try:
+            with open(index_path, 'rb') as f:
+                cached = json.load(f)
+            if cached['source_key'] == source_key and isinstance(cached['index'], dict):
+                return cached['index']
+        except Exception:
+            # Любой нечитаемый или чужой индекс просто перестраивается
+            pass
+
+        with open(test_file_path, 'r', encoding='utf-8') as f:
+            index = self._parse_dependencies_from_file(f.read())
+
+        try:
+            tmp_path = index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'source_key': source_key, 'index': index}, f)
+            os.replace(tmp_path, index_path)
+        except OSError:
+            pass
+
+        return index
+
+    def _parse_dependencies_from_file(self, content: str) -> Dict[str, List[str]]:
+        """Построение индекса пакет -> зависимости из тестового файла"""
+        index = {}
+        for line in content.strip().split('\n'):
             if ':' in line:
                 pkg_name, deps_str = line.split(':', 1)
-                if pkg_name.strip().lower() == package_name.lower():
-                    dependencies = [dep.strip() for dep in deps_str.split(',') if dep.strip()]
-                    return dependencies
-
-        raise DependencyFetchError(f"Пакет '{package_name}' не найден в тестовом файле")
+                index.setdefault(
+                    pkg_name.strip().lower(),
+                    [dep.strip() for dep in deps_str.split(',') if dep.strip()]
+                )
+        return index
 
     def print_config(self) -> None:
-        print("Конфигурация приложения:")
-        print("-" * 40)
-        for key, value in self.config.items():
-            print(f"{key:25}: {value}")
-        print("-" * 40)
+        lines = ["Конфигурация приложения:", "-" * 40]
+        lines.extend(f"{key:25}: {value}" for key, value in self.config.items())
+        lines.append("-" * 40)
+        sys.stdout.write('\n'.join(lines) + '\n')
 
     def print_dependencies(self) -> None:
         """Вывод прямых зависимостей пакета (требование этапа 2)"""
@@ -182,16 +473,15 @@ class DependencyVisualizer:
             print(f"Пакет '{self.config['package_name']}' не имеет прямых зависимостей")
             return
 
-        print(f"Прямые зависимости пакета '{self.config['package_name']}':")
-        print("-" * 40)
-        for i, dep in enumerate(self.dependencies, 1):
-            print(f"{i:2}. {dep}")
-        print("-" * 40)
+        lines = [f"Прямые зависимости пакета '{self.config['package_name']}':", "-" * 40]
+        lines.extend(f"{i:2}. {dep}" for i, dep in enumerate(self.dependencies, 1))
+        lines.append("-" * 40)
+        sys.stdout.write('\n'.join(lines) + '\n')
 
 
 def main():
     try:
-        visualizer = DependencyVisualizer()
+        visualizer = DependencyVisualizer(refresh='--refresh' in sys.argv[1:])
         config = visualizer.load_config()
         visualizer.print_config()
 
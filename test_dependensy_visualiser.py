@@ -0,0 +1,265 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import dependensy_visualiser
+from dependensy_visualiser import DependencyVisualizer, DependencyFetchError, ConfigError
+
+
+CONFIG_TEMPLATE = """<?xml version="1.0" encoding="UTF-8"?>
+<config>
+    {package}
+    <repository_url>https://pypi.org/simple/</repository_url>
+    <test_mode>false</test_mode>
+    <test_repository_path>test_repo.txt</test_repository_path>
+    <output_filename>dependencies_graph.png</output_filename>
+</config>"""
+
+
+class LoadConfigTest(unittest.TestCase):
+    """Проверки выполняются на том XML-бэкенде, который установлен (lxml или stdlib)"""
+
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.tmp_dir = Path(tmp_dir.name)
+
+    def _load(self, text):
+        config_path = self.tmp_dir / 'config.xml'
+        config_path.write_text(text, encoding='utf-8')
+        return DependencyVisualizer().load_config(str(config_path))
+
+    def test_surrounding_whitespace_is_stripped(self):
+        config = self._load(CONFIG_TEMPLATE.format(package='<package_name>\n   requests  </package_name>'))
+        self.assertEqual(config['package_name'], 'requests')
+        self.assertEqual(config['test_mode'], 'false')
+
+    def test_comments_and_pis_inside_value_are_ignored(self):
+        config = self._load(CONFIG_TEMPLATE.format(package='<package_name><!--x-->requests</package_name>'))
+        self.assertEqual(config['package_name'], 'requests')
+
+        config = self._load(CONFIG_TEMPLATE.format(package='<package_name><?pi x?>requests</package_name>'))
+        self.assertEqual(config['package_name'], 'requests')
+
+    def test_sample_config_loads(self):
+        config = DependencyVisualizer().load_config(str(Path(__file__).with_name('config.xml')))
+        self.assertEqual(config['package_name'], 'requests')
+        self.assertEqual(config['output_filename'], 'dependencies_graph.png')
+
+    def test_only_direct_children_of_root_are_read(self):
+        package = '<meta><package_name>nested</package_name></meta><package_name>top</package_name>'
+        self.assertEqual(self._load(CONFIG_TEMPLATE.format(package=package))['package_name'], 'top')
+
+        with self.assertRaisesRegex(ConfigError, 'package_name'):
+            self._load(CONFIG_TEMPLATE.format(package='<meta><package_name>nested</package_name></meta>'))
+
+    def test_first_duplicate_wins(self):
+        package = '<package_name>first</package_name><package_name>second</package_name>'
+        self.assertEqual(self._load(CONFIG_TEMPLATE.format(package=package))['package_name'], 'first')
+
+    def test_malformed_config_raises(self):
+        with self.assertRaisesRegex(ConfigError, 'Ошибка парсинга XML'):
+            self._load('<config><package_name>requests</package_name>')
+
+
+class TestIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.repo_path = Path(tmp_dir.name) / 'test_repo.txt'
+        self.index_path = Path(str(self.repo_path) + dependensy_visualiser.TEST_INDEX_SUFFIX)
+        self.repo_path.write_text('requests: urllib3, idna\nflask: click\n', encoding='utf-8')
+
+    def _fetch(self, package_name):
+        visualizer = DependencyVisualizer()
+        visualizer.config = {'test_repository_path': str(self.repo_path), 'package_name': package_name}
+        return visualizer._fetch_from_test_file()
+
+    def test_first_lookup_writes_index(self):
+        self.assertEqual(self._fetch('Requests'), ['urllib3', 'idna'])
+
+        cached = json.loads(self.index_path.read_text(encoding='utf-8'))
+        self.assertEqual(cached['index']['flask'], ['click'])
+
+    def test_edited_source_rebuilds_index(self):
+        self.assertEqual(self._fetch('flask'), ['click'])
+
+        self.repo_path.write_text('flask: click, jinja2, werkzeug\n', encoding='utf-8')
+        st = self.repo_path.stat()
+        os.utime(self.repo_path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+        self.assertEqual(self._fetch('flask'), ['click', 'jinja2', 'werkzeug'])
+        with self.assertRaisesRegex(DependencyFetchError, 'не найден'):
+            self._fetch('requests')
+
+    def test_garbage_index_is_rebuilt(self):
+        self.index_path.write_bytes(b'\x80\x09xx')
+
+        self.assertEqual(self._fetch('requests'), ['urllib3', 'idna'])
+        self.assertIn('requests', json.loads(self.index_path.read_text(encoding='utf-8'))['index'])
+
+    def test_test_mode_does_not_import_pypi_modules(self):
+        script = (
+            'import sys, dependensy_visualiser as d\n'
+            'v = d.DependencyVisualizer()\n'
+            f'v.config = {{"test_repository_path": {str(self.repo_path)!r}, "package_name": "flask"}}\n'
+            'v._fetch_from_test_file()\n'
+            'print(sorted(m for m in ("packaging", "requests", "urllib.request") if m in sys.modules))\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=Path(__file__).parent,
+            capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), '[]')
+
+
+# Заглушка PyPI: нормализованное имя пакета -> requires_dist
+STUB_PYPI = {
+    'root': ['typing_extensions>=4', 'Typing-Extensions', 'missing', 'docs-only; extra == "docs"'],
+    'typing-extensions': ['zope.interface'],
+    'zope-interface': [],
+}
+
+
+class FetchTransitiveTest(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        patcher = mock.patch.object(dependensy_visualiser, 'PYPI_CACHE_DIR', Path(cache_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.downloads = []
+        self.visualizer = DependencyVisualizer(refresh=True)
+        self.visualizer._download_pypi_json = self._download
+
+    def _download(self, package_name):
+        self.downloads.append(package_name)
+        if package_name not in STUB_PYPI:
+            raise DependencyFetchError(f"Пакет '{package_name}' не найден в PyPI")
+        return {'info': {'requires_dist': STUB_PYPI[package_name]}}
+
+    def test_graph_uses_normalized_names_and_skips_extras(self):
+        graph = self.visualizer.fetch_transitive('Root')
+
+        self.assertEqual(graph, {
+            'root': ['typing-extensions', 'missing'],
+            'typing-extensions': ['zope-interface'],
+            'zope-interface': [],
+            'missing': [],
+        })
+        self.assertEqual(sorted(self.downloads), ['missing', 'root', 'typing-extensions', 'zope-interface'])
+
+    def test_failed_dependency_is_recorded(self):
+        graph = self.visualizer.fetch_transitive('root')
+
+        self.assertIn('missing', graph)
+        self.assertEqual(list(self.visualizer.fetch_errors), ['missing'])
+
+    def test_failed_root_raises(self):
+        with self.assertRaises(DependencyFetchError):
+            self.visualizer.fetch_transitive('missing')
+
+
+class PypiCacheTest(unittest.TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = Path(cache_dir.name)
+        patcher = mock.patch.object(dependensy_visualiser, 'PYPI_CACHE_DIR', self.cache_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.cache_path = self.cache_dir / 'flask.json'
+        self.downloads = []
+
+    def _fetch(self, refresh=False):
+        visualizer = DependencyVisualizer(refresh=refresh)
+        visualizer._download_pypi_json = self._download
+        return visualizer._fetch_one('Flask')
+
+    def _download(self, package_name):
+        self.downloads.append(package_name)
+        return {'info': {'requires_dist': ['downloaded']}}
+
+    def _write_cache(self, data, age=0):
+        self.cache_path.write_text(json.dumps(data), encoding='utf-8')
+        mtime = time.time() - age
+        os.utime(self.cache_path, (mtime, mtime))
+
+    def test_fresh_cache_is_used(self):
+        self._write_cache({'info': {'requires_dist': ['cached']}})
+
+        self.assertEqual(self._fetch(), ['cached'])
+        self.assertEqual(self.downloads, [])
+
+    def test_stale_cache_is_downloaded_again(self):
+        self._write_cache({'info': {'requires_dist': ['cached']}}, age=dependensy_visualiser.PYPI_CACHE_TTL + 60)
+
+        self.assertEqual(self._fetch(), ['downloaded'])
+        self.assertEqual(self.downloads, ['Flask'])
+        self.assertEqual(json.loads(self.cache_path.read_text(encoding='utf-8'))['info']['requires_dist'], ['downloaded'])
+
+    def test_refresh_ignores_cache(self):
+        self._write_cache({'info': {'requires_dist': ['cached']}})
+
+        self.assertEqual(self._fetch(refresh=True), ['downloaded'])
+        self.assertEqual(self.downloads, ['Flask'])
+
+    def test_non_dict_cache_is_a_miss(self):
+        self._write_cache(['not', 'a', 'dict'])
+
+        self.assertEqual(self._fetch(), ['downloaded'])
+
+    def test_write_leaves_no_temporary_file(self):
+        self._fetch()
+
+        self.assertEqual([p.name for p in self.cache_dir.iterdir()], ['flask.json'])
+
+
+class SessionTest(unittest.TestCase):
+    def _stub_requests(self):
+        class HTTPAdapter:
+            def __init__(self, pool_maxsize=10):
+                self.pool_maxsize = pool_maxsize
+
+        class Session:
+            def __init__(self):
+                self.headers = {}
+                self.adapters = {}
+
+            def mount(self, prefix, adapter):
+                self.adapters[prefix] = adapter
+
+        requests = types.ModuleType('requests')
+        requests.adapters = types.ModuleType('requests.adapters')
+        requests.adapters.HTTPAdapter = HTTPAdapter
+        requests.Session = Session
+        return requests
+
+    def test_session_pool_fits_all_workers(self):
+        with mock.patch.dict(sys.modules, {'requests': self._stub_requests()}):
+            session = DependencyVisualizer()._get_session()
+
+        self.assertEqual(session.headers['Accept-Encoding'], 'gzip')
+        self.assertEqual(session.adapters['https://'].pool_maxsize, dependensy_visualiser.PYPI_MAX_WORKERS)
+
+    def test_session_is_created_once(self):
+        visualizer = DependencyVisualizer()
+        with mock.patch.dict(sys.modules, {'requests': self._stub_requests()}):
+            self.assertIs(visualizer._get_session(), visualizer._get_session())
+
+    def test_no_session_without_requests(self):
+        with mock.patch.dict(sys.modules, {'requests': None}):
+            self.assertIsNone(DependencyVisualizer()._get_session())
+
+
+if __name__ == '__main__':
+    unittest.main()